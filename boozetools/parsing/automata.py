@@ -192,10 +192,10 @@ class UnitReductionEliminator:
 		self.bft = bft
 		self.unit_rules = {}
 		self.eligible_rhs = set()
-		for rule_id, rule in enumerate(grammar.rules):
-			if rule.is_rename():
-				self.unit_rules[rule_id] = rule.lhs
-				self.eligible_rhs.add(rule.rhs[0])
+		for rule_id in grammar.renaming_rules():
+			rule = grammar.rules[rule_id]
+			self.unit_rules[rule_id] = rule.lhs
+			self.eligible_rhs.add(rule.rhs[0])
 
 	def find_shifts(self, step: dict) -> dict:
 		"""
@@ -309,11 +309,12 @@ def lalr_first_and_follow(lr0:HFA[LR0_State]) -> Tuple[list, dict]:
 			follow[q,rule_id] = foundation.allocate(token_sets, set())
 	# Generate a token-set inflow graph with nodes as lists of inbound edges.
 	inflow:List[Set[int]] = [set() for _ in token_sets]
+	RHS = grammar.augmented_rules()
 	for q, node in enumerate(lr0.graph):
 		for symbol, target in node.shift.items():
 			if symbol in grammar.symbol_rule_ids: # That is, if symbol is non-terminal,
 				for rule_id in grammar.symbol_rule_ids[symbol]:
-					rule_end = lr0.traverse(q, grammar.rules[rule_id].rhs)
+					rule_end = lr0.traverse(q, RHS[rule_id])
 					if (rule_end, rule_id) in follow: # Otherwise a unit-reduction was elided here.
 						inflow[rule_end].add(target)
 						inflow[follow[rule_end, rule_id]].add(target)
@@ -451,7 +452,7 @@ def minimal_lr1(grammar: context_free.ContextFreeGrammar) -> HFA[LA_State]:
 			# Most of the smarts in this algorithm comes down to understanding what
 			# LALR found at the far end of each sub-production. We need to know which
 			# LR(0) state you reach after shifting the contents of that sub-rule:
-			reach = lr0.traverse(iso_q, grammar.rules[sub_rule_id].rhs)
+			reach = lr0.traverse(iso_q, RHS[sub_rule_id])
 			if follower is None:  # We're coming from LALR-land:
 				items.append((sub_rule_id, 0, None))
 				reach_conflict = conflict_data[reach].rules.get(sub_rule_id, EMPTY)
@@ -500,6 +501,7 @@ def minimal_lr1(grammar: context_free.ContextFreeGrammar) -> HFA[LA_State]:
 			else: reduce[follower] = [rule_id]
 	
 	EMPTY = frozenset()
+	RHS = grammar.augmented_rules()
 	lr0 = lr0_construction(grammar) # This implicitly solves a lot of sub-problems.
 	token_sets, follow = lalr_first_and_follow(lr0)
 	# Later we need to know if a certain rule is implicated in an LALR conflict: if so, for which terminals?
@@ -6,8 +6,8 @@ functionality beyond simple queries. That's because the kinds of work people mig
 to a model of a grammar extends far beyond the specific applications here included.
 """
 
-import collections, itertools
-from typing import List, Optional, NamedTuple, Hashable, Sequence
+import collections, array
+from typing import List, Tuple, Optional, NamedTuple, Hashable, Sequence
 from ..support import foundation, pretty
 
 LEFT, RIGHT, NONASSOC, BOGUS = object(), object(), object(), object()
@@ -48,9 +48,23 @@ class ContextFreeGrammar:
 		self.start = [] # The start symbol(s) may be specified asynchronously to construction or the rules.
 		self.rules, self.token_precedence, self.level_assoc = [], {}, []
 		self.symbol_rule_ids = {}
+		self._lhs, self._rhs = [], [] # Parallel to self.rules, for the benefit of the tighter loops.
+		self._lhs_id, self._rhs_id = [], [] # Likewise, but in terms of symbol numbers.
+		self._is_rename = [] # Likewise, the answer to Rule.is_rename()
+		self._rhs_pool = {} # Interns each distinct right-hand side, as: rhs -> (rhs, rhs_id, set of lhs)
+		self._symbol_index = foundation.EquivalenceClassifier() # Numbers the symbols for graph algorithms.
+		self._invalidate()
+	
+	def _invalidate(self):
+		""" Forget all analysis derived from the grammar, because the precedence declarations have changed. """
+		self._first_epsilon = None
+		self._flat = None
+		self._rule_precedence = {} # rule_id -> precedence level (or None), filled in as needed.
+		self._checkpoint = None # Set by a successful validate().
+	
 	def display(self):
 		head = ['', 'Symbol', 'Produces', 'Using']
-		body = [[i, rule.lhs, rule.rhs, rule.attribute] for i,rule in enumerate(self.rules)]
+		body = [[i, rule.lhs, ' '.join(rule.rhs), rule.constructor] for i,rule in enumerate(self.rules)]
 		pretty.print_grid([head] + body)
 
 	def rule(self, lhs:str, rhs:List[str], prec_sym, constructor:Hashable, places:(list, tuple, int), origin):
@@ -92,13 +106,26 @@ class ContextFreeGrammar:
 		"""
 		if lhs in self.token_precedence: raise NonTerminalsCannotHavePrecedence(lhs)
 		self.symbols.add(lhs)
-		self.symbols.update(rhs)
+		lhs_id = self._symbol_index.classify(lhs)
+		rhs = tuple(rhs)
+		try: rhs, rhs_id, producers = self._rhs_pool[rhs]
+		except KeyError:
+			self.symbols.update(rhs)
+			rhs_id = tuple(map(self._symbol_index.classify, rhs))
+			producers = set()
+			self._rhs_pool[rhs] = rhs, rhs_id, producers
 		if lhs not in self.symbol_rule_ids: self.symbol_rule_ids[lhs] = []
 		if isinstance(places, int): assert constructor is None and 0 <= places < len(rhs)
 		else: assert isinstance(places, (list, tuple)) and all(p<len(rhs) for p in places), places
-		sri = self.symbol_rule_ids[lhs]
-		if any(self.rules[rule_id].rhs == rhs for rule_id in sri): raise DuplicateRule(lhs, rhs)
-		sri.append(foundation.allocate(self.rules, Rule(lhs, rhs, prec_sym, constructor, places, origin)))
+		if lhs in producers: raise DuplicateRule(lhs, rhs)
+		producers.add(lhs)
+		self.symbol_rule_ids[lhs].append(foundation.allocate(self.rules, Rule(lhs, rhs, prec_sym, constructor, places, origin)))
+		self._lhs.append(lhs)
+		self._rhs.append(rhs)
+		self._lhs_id.append(lhs_id)
+		self._rhs_id.append(rhs_id)
+		self._is_rename.append(constructor is None and len(rhs) == 1 and places == 0)
+		self._first_epsilon = self._flat = None # New rules don't disturb the rest of the derived data; see validate().
 	
 	def augmented_rules(self) -> list:
 		"""
@@ -114,16 +141,42 @@ class ContextFreeGrammar:
 		NB: Since we support multiple "start" symbols, there are corresponding "accept" rules.
 		"""
 		assert self.start
-		return [rule.rhs for rule in self.rules] + [[language] for language in self.start]
+		return self._rhs + [(language,) for language in self.start]
 	
 	def initial(self) -> range:
 		""" The range of augmented-rule indices corresponding to the list of start symbols. """
 		first = len(self.rules)
 		return range(first, first+len(self.start))
 	
+	def renaming_rules(self) -> list:
+		""" The ids of those rules which are pure renamings, and thus eligible for the unit-rule optimization. """
+		return [rule_id for rule_id, flag in enumerate(self._is_rename) if flag]
+	
 	def apparent_terminals(self) -> set:
 		""" Of all symbols mentioned, those without production rules are apparently terminal. """
 		return self.symbols - self.symbol_rule_ids.keys()
+	
+	def flat_rules(self) -> "FlatRules":
+		"""
+		The rules, reduced to integers and packed into flat arrays in the usual "compressed sparse row"
+		manner. This is for the benefit of whatever numerical machinery you care to bring: the arrays
+		support the buffer protocol, so (for instance) numpy.frombuffer can view them without copying.
+		It's built on first request and remembered until the grammar changes.
+		"""
+		if self._flat is None:
+			catalog = self._symbol_index.catalog
+			rhs_offset = array.array('i', [0])
+			for rhs in self._rhs_id: rhs_offset.append(rhs_offset[-1] + len(rhs))
+			terminal_mask = 0
+			for symbol in self.apparent_terminals(): terminal_mask |= 1 << catalog[symbol]
+			self._flat = FlatRules(
+				symbols=list(self._symbol_index.exemplars),
+				lhs=array.array('i', self._lhs_id),
+				rhs_offset=rhs_offset,
+				rhs=array.array('i', [s for rhs in self._rhs_id for s in rhs]),
+				terminal_mask=terminal_mask,
+			)
+		return self._flat
 
 	def find_first_and_epsilon(self):
 		"""
@@ -131,38 +184,72 @@ class ContextFreeGrammar:
 			Which terminals can symbol X begin with?
 			Which symbols can produce the empty string?
 		This solution takes pains not to repeat work, and so should be reasonably quick.
+		The answer is remembered until the grammar changes, so please don't mutate it.
+		"""
+		if self._first_epsilon is None: self._first_epsilon = self.__compute_first_and_epsilon()
+		return self._first_epsilon
+	
+	def __compute_first_and_epsilon(self):
 		"""
-		epsilon = set()
-		first = {s:{s} for s in self.symbols}
-		hangar = collections.defaultdict(list)
-		work = [(i,0) for i in range(len(self.rules))]
+		This works in terms of symbol numbers. First a worklist pass finds the nullable symbols
+		and the symbols each rule can directly begin with. Then the strongly-connected components
+		of that "begins-with" graph are visited in reverse topological order, accumulating the
+		terminals each symbol can begin with as a bit-set: bit q of the int stands for symbol q.
+		"""
+		exemplars = self._symbol_index.exemplars
+		epsilon = bytearray(len(exemplars)) # Indexed by symbol number
+		begins = [set() for _ in exemplars] # symbol -> symbols it may directly begin with.
+		waiting = collections.defaultdict(list) # symbol -> (rule_id, position) pairs blocked until it proves nullable.
+		lhs_of, rhs_of = self._lhs_id, self._rhs_id
+		work = [(r,0) for r in range(len(rhs_of))]
 		while work:
 			r,p = work.pop()
-			lhs, rhs, _, _, _, _ = self.rules[r]
-			if p == len(rhs):
-				epsilon.add(lhs)
-				if lhs in hangar: work.extend(hangar.pop(lhs))
-			else:
+			lhs, rhs = lhs_of[r], rhs_of[r]
+			b = begins[lhs]
+			while p < len(rhs):
 				symbol = rhs[p]
-				first[lhs].add(symbol)
-				if symbol in epsilon: work.append((r,p+1))
-				else: hangar[symbol].append((r,p+1))
-		for component in foundation.strongly_connected_components_hashable(first):
-			f = set()
-			for symbol in component:
-				f.update(*(first[x] for x in first[symbol]))
-				first[symbol] = f
-			f.difference_update(self.symbol_rule_ids)
-		return first, epsilon
-		
-	def assert_no_bogons(self):
-		""" "Bogus" tokens only exist to establish precedence levels and must not appear in right-hand sides. """
-		bogons = {sym for sym, prec in self.token_precedence.items() if self.level_assoc[prec] is BOGUS}
-		for rule_id, rule in enumerate(self.rules):
-			if any(symbol in bogons for symbol in rule.rhs):
+				b.add(symbol)
+				p += 1
+				if not epsilon[symbol]:
+					waiting[symbol].append((r,p))
+					break
+			else:
+				if not epsilon[lhs]:
+					epsilon[lhs] = True
+					work.extend(waiting.pop(lhs, ()))
+		terminal_mask = self.flat_rules().terminal_mask
+		bits = [1 << q for q in range(len(exemplars))]
+		for component in foundation.strongly_connected_components_by_tarjan(begins):
+			acc = 0
+			for q in component:
+				acc |= bits[q]
+				for r in begins[q]: acc |= bits[r]
+			acc &= terminal_mask
+			for q in component: bits[q] = acc
+		def members(b):
+			result = set()
+			while b:
+				low = b & -b
+				result.add(exemplars[low.bit_length()-1])
+				b ^= low
+			return result
+		first = {symbol: members(b) for symbol, b in zip(exemplars, bits)}
+		return first, {symbol for symbol, e in zip(exemplars, epsilon) if e}
+	
+	def assert_no_bogons(self, baseline:"Checkpoint"=None):
+		"""
+		"Bogus" tokens only exist to establish precedence levels and must not appear in right-hand sides.
+		Given a baseline, only the rules added since then need checking: assoc() would have discarded it.
+		"""
+		catalog = self._symbol_index.catalog
+		bogons = {catalog[sym] for sym, prec in self.token_precedence.items() if self.level_assoc[prec] is BOGUS and sym in catalog}
+		if not bogons: return # A bogon that no rule ever mentions is harmless.
+		since = baseline.nr_rules if baseline else 0
+		for rule_id, rhs in enumerate(self._rhs_id[since:], since):
+			if not bogons.isdisjoint(rhs):
 				raise RuleProducesBogusToken(rule_id)
 	
-	def assert_well_founded(self):
+	def assert_well_founded(self, baseline:"Checkpoint"=None):
 		"""
 		Here, "well-founded" means "can possibly produce a finite sequence of terminals."
 		"Ill-founded" is the opposite. Example ill-founded grammars:
@@ -173,34 +260,68 @@ class ContextFreeGrammar:
 		A rule with only well-founded symbols in the right-hand side is well-founded.
 		A non-terminal symbol with at least one well-founded rule is well-founded.
 		Induction applies. A grammar with only well-founded symbols is well-founded.
+		
+		This works bottom-up in linear time: each rule counts its ill-founded RHS symbols,
+		and as each symbol is found to be well-founded, the rules that mention it count down.
+		
+		Given a baseline, every symbol known back then was well-founded, so only the rules added
+		since then need consideration. The exception is if one of those gives a production to a
+		symbol that used to be terminal: then everything gets reconsidered from scratch.
 		"""
-		well_founded = self.apparent_terminals()
-		black = list(self.rules)
-		while black:
-			red = []
-			for rule in black:
-				if rule.lhs not in well_founded:
-					if all(s in well_founded for s in rule.rhs): well_founded.add(rule.lhs)
-					else: red.append(rule)
-			if len(red) < len(black): black = red
-			else: raise IllFoundedSymbols(set(rule.lhs for rule in red))
+		since, known = (baseline.nr_rules, baseline.nr_symbols) if baseline else (0, 0)
+		for lhs, lhs_id in zip(self._lhs[since:], self._lhs_id[since:]):
+			if lhs_id < known and self.symbol_rule_ids[lhs][0] >= since: since, known = 0, 0
+		exemplars = self._symbol_index.exemplars
+		well_founded = bytearray(b'\1' * known) + bytearray(len(exemplars) - known) # Indexed by symbol number
+		for symbol in self.apparent_terminals(): well_founded[self._symbol_index.catalog[symbol]] = True
+		pending = {} # rule_id -> the number of distinct right-hand symbols not yet known well-founded.
+		users = [[] for _ in exemplars] # per symbol, the ids of the rules which are waiting on it.
+		work = []
+		for rule_id, rhs in enumerate(self._rhs_id[since:], since):
+			waiting_on = {s for s in rhs if not well_founded[s]}
+			for s in waiting_on: users[s].append(rule_id)
+			if not waiting_on: work.append(rule_id)
+			pending[rule_id] = len(waiting_on)
+		while work:
+			lhs = self._lhs_id[work.pop()]
+			if not well_founded[lhs]:
+				well_founded[lhs] = True
+				for rule_id in users[lhs]:
+					pending[rule_id] -= 1
+					if not pending[rule_id]: work.append(rule_id)
+		ill_founded = {symbol for symbol, ok in zip(exemplars, well_founded) if not ok}
+		if ill_founded: raise IllFoundedSymbols(ill_founded)
 	
-	def assert_no_orphans(self):
-		""" Every symbol should be reachable from the start symbol(s). """
+	def assert_no_orphans(self, baseline:"Checkpoint"=None):
+		"""
+		Every symbol should be reachable from the start symbol(s).
+		
+		Given a baseline, every symbol known back then was reachable, and so are the start symbols
+		of that time. Then new symbols can only be reached along the rules added since.
+		"""
+		since, known = (baseline.nr_rules, baseline.nr_symbols) if baseline else (0, 0)
+		catalog = self._symbol_index.catalog
 		produces = collections.defaultdict(set)
-		for rule in self.rules: produces[rule.lhs].update(rule.rhs)
-		unreachable = self.symbols - foundation.transitive_closure(self.start, produces.get)
+		for lhs, rhs in zip(self._lhs[since:], self._rhs[since:]): produces[lhs].update(rhs)
+		stack = self.start + [lhs for lhs in produces if catalog[lhs] < known]
+		reached = set(stack)
+		while stack:
+			for symbol in produces.get(stack.pop(), ()):
+				if symbol not in reached:
+					reached.add(symbol)
+					stack.append(symbol)
+		unreachable = {symbol for symbol in self._symbol_index.exemplars[known:] if symbol not in reached}
 		if unreachable: raise UnreachableSymbols(unreachable) # NB: Bogons are not among self.symbols.
 	
 	def assert_no_rename_loops(self):
 		""" If a symbol may be replaced by itself (possibly indirectly) then it is diseased. """
 		broken = set()
 		renames = collections.defaultdict(set)
-		for lhs, rhs, _, _, _, _ in self.rules:
+		for lhs, rhs in zip(self._lhs, self._rhs):
 			if len(rhs) == 1:
 				if lhs == rhs[0]: broken.add(lhs)
 				else: renames[lhs].add(rhs[0])
-		for component in foundation.strongly_connected_components_hashable(renames):
+		for component in self._strongly_connected_components(renames):
 			if len(component) > 1: broken.update(component)
 		if broken: raise RenamingLoop(broken)
 	
@@ -209,13 +330,15 @@ class ContextFreeGrammar:
 		first, epsilon = self.find_first_and_epsilon()
 		reaches = collections.defaultdict(set)
 		broken = set()
-		for lhs, rhs, _, _, _, _ in self.rules:
-			epsilon_prefix = list(itertools.takewhile(epsilon.__contains__, rhs))
-			if not epsilon_prefix: continue
-			if epsilon_prefix[0] == lhs: epsilon_prefix.pop(0)
-			if lhs in epsilon_prefix: broken.add(lhs)
-			reaches[lhs].update(epsilon_prefix)
-		for component in foundation.strongly_connected_components_hashable(reaches):
+		for lhs, rhs in zip(self._lhs, self._rhs):
+			# Consider the epsilon-prefix rhs[start:end], less any left-self-recursion:
+			end = 0
+			while end < len(rhs) and rhs[end] in epsilon: end += 1
+			start = 1 if end and rhs[0] == lhs else 0
+			for i in range(start, end):
+				if rhs[i] == lhs: broken.add(lhs)
+				else: reaches[lhs].add(rhs[i])
+		for component in self._strongly_connected_components(reaches):
 			if len(component) > 1: broken.update(component)
 		if broken: raise EpsilonLoop(broken)
 		
@@ -225,12 +348,32 @@ class ContextFreeGrammar:
 		It might be nice to get a more complete read-out of problems, but that would mean
 		inventing some sort of document structure to talk about faults in grammars.
 		Then again, maybe that's in the pipeline.
+		
+		A successful validation leaves a checkpoint. Calling this again with no changes is cheap.
+		If rules were added since, the bogon, well-foundedness and reachability checks consider only
+		the new rules. The loop checks depend on the whole grammar, so they always run in full.
+		Precedence declarations discard the checkpoint, as does removing any start symbol.
 		"""
-		self.assert_no_bogons()
-		self.assert_well_founded()
-		self.assert_no_orphans()
+		baseline = self._checkpoint
+		if baseline is not None:
+			if baseline.nr_rules == len(self.rules) and baseline.start == self.start: return
+			if not set(baseline.start) <= set(self.start): baseline = None
+		self.assert_no_bogons(baseline)
+		self.assert_well_founded(baseline)
+		self.assert_no_orphans(baseline)
 		self.assert_no_rename_loops()
 		self.assert_no_epsilon_loops()
+		self._checkpoint = Checkpoint(len(self.rules), len(self._symbol_index.exemplars), list(self.start))
+	
+	def _strongly_connected_components(self, graph:dict) -> list:
+		"""
+		Like foundation.strongly_connected_components_hashable, but for graphs among this grammar's
+		symbols: the symbols already have numbers, so Tarjan's algorithm can run on plain integers.
+		"""
+		catalog, exemplars = self._symbol_index.catalog, self._symbol_index.exemplars
+		adjacency = [()] * len(exemplars)
+		for symbol, successors in graph.items(): adjacency[catalog[symbol]] = [catalog[s] for s in successors]
+		return [[exemplars[q] for q in component] for component in foundation.strongly_connected_components_by_tarjan(adjacency)]
 	
 	def assoc(self, direction, symbols):
 		assert direction in (LEFT, NONASSOC, RIGHT, BOGUS)
@@ -240,6 +383,7 @@ class ContextFreeGrammar:
 			if symbol in self.symbol_rule_ids: raise NonTerminalsCannotHavePrecedence(symbol)
 			if symbol in self.token_precedence: raise PrecedenceDeclaredTwice(symbol)
 			self.token_precedence[symbol] = level
+		self._invalidate()
 			
 	def decide_shift_reduce(self, symbol, rule_id):
 		try: sp = self.token_precedence[symbol]
@@ -268,14 +412,35 @@ class ContextFreeGrammar:
 				return symbol
 	
 	def determine_rule_precedence(self, rule_id):
+		""" Table construction asks this repeatedly about the same rules, so the answers are remembered. """
+		try: return self._rule_precedence[rule_id]
+		except KeyError: pass
 		rule = self.rules[rule_id]
 		prec_sym = rule.prec_sym or self.infer_prec_sym(rule.rhs)
-		if prec_sym: return self.token_precedence[prec_sym]
+		level = self._rule_precedence[rule_id] = self.token_precedence[prec_sym] if prec_sym else None
+		return level
+
+class FlatRules(NamedTuple):
+	"""
+	Rule r produces symbol number lhs[r] from the symbol numbers rhs[rhs_offset[r]:rhs_offset[r+1]].
+	Symbol number q is called symbols[q], and is terminal exactly if bit q of terminal_mask is set.
+	"""
+	symbols: List[str]
+	lhs: array.array
+	rhs_offset: array.array
+	rhs: array.array
+	terminal_mask: int
+
+class Checkpoint(NamedTuple):
+	""" How far the grammar had grown as of the last successful validation. """
+	nr_rules: int
+	nr_symbols: int
+	start: list
 
 class Rule(NamedTuple):
 	# The first few fields define the actual grammar
 	lhs: str
-	rhs: List[str]
+	rhs: Tuple[str, ...]
 	prec_sym: Optional[str]
 	# The next couple deal with the idea of attribute synthesis
 	constructor: Hashable
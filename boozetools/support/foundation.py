@@ -81,34 +81,44 @@ def strongly_connected_components_by_tarjan(graph):
 	See https://en.wikipedia.org/wiki/Tarjan%27s_strongly_connected_components_algorithm
 	Returns a list of strongly-connected components in reverse topological order.
 	Each component is a list of member node numbers. Deviating slightly from the wikipedia
-	presentation, the low-link is local to the recursive call, eliminating one confusion.
+	presentation, the recursion is replaced by an explicit path of (node, arc-iterator) pairs,
+	so that deep graphs (like those of large grammars) don't hit Python's recursion limit.
 	
 	It's expected that graph[q] is the list of arcs from (or perhaps to) node q.
 	The linear-time bound assumes all nodes are numbered from 0..last. An isomorphism
 	for hashable node keys is provided below.
 	"""
-	def unvisited(q): return index[q] is None
-	def connect(q) -> int:
-		low_link = index[q] = allocate(stack, q)
-		on_stack[q] = True
-		for r in graph[q]:
-			if unvisited(r): low_link = min(low_link, connect(r))
-			elif on_stack[r]: low_link = min(low_link, index[r])
-		if low_link == index[q]: # i.e. if node q is the root of an SCC:
-			component = stack[low_link:]
-			del stack[low_link:]
-			for r in component: on_stack[r] = False
-			output.append(component)
-		return low_link
-	def main():
-		for q in range(size):
-			if unvisited(q): connect(q)
 	size = len(graph)
 	index = [None] * size
+	low_link = [None] * size
 	on_stack = [False] * size
 	stack = []
 	output = []
-	main()
+	def enter(q):
+		index[q] = low_link[q] = allocate(stack, q)
+		on_stack[q] = True
+		path.append((q, iter(graph[q])))
+	for root in range(size):
+		if index[root] is not None: continue
+		path = []
+		enter(root)
+		while path:
+			q, arcs = path[-1]
+			for r in arcs:
+				if index[r] is None:
+					enter(r)
+					break
+				elif on_stack[r]: low_link[q] = min(low_link[q], index[r])
+			else:
+				path.pop()
+				if low_link[q] == index[q]: # i.e. if node q is the root of an SCC:
+					component = stack[index[q]:]
+					del stack[index[q]:]
+					for r in component: on_stack[r] = False
+					output.append(component)
+				if path:
+					p = path[-1][0]
+					low_link[p] = min(low_link[p], low_link[q])
 	return output
 
 def strongly_connected_components_hashable(graph:dict):
@@ -7,8 +7,14 @@ DOT = '\u25cf'
 def print_grid(grid):
 	lens = list(map(len, grid))
 	assert len(set(lens)) == 1, lens
-	grid = [[str(cell) for cell in row] for row in grid]
-	width = [max(map(len, column)) for column in zip(*grid)]
+	width = [0] * lens[0]
+	text = []
+	for row in grid:
+		row = [str(cell) for cell in row]
+		for j, s in enumerate(row):
+			if len(s) > width[j]: width[j] = len(s)
+		text.append(row)
+	grid = text
 	horizontal = '\u2500'
 	vertical = ' \u2502 '
 	upper = horizontal + '\u252c' + horizontal
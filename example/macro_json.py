@@ -36,19 +36,21 @@ class ExampleJSON:
 	"""
 	
 	RESERVED = {'true': True, 'false':False, 'null':None}
-	ESCAPES = {'b': 8, 't': 9, 'n': 10, 'f': 12, 'r': 13, }
+	ESCAPES = {'b': '\b', 't': '\t', 'n': '\n', 'f': '\f', 'r': '\r', }
 	
 	def scan_ignore_whitespace(self, yy: interfaces.Scanner): pass
 	def scan_punctuation(self, yy: interfaces.Scanner): yy.token(yy.matched_text())
 	def scan_integer(self, yy: interfaces.Scanner): yy.token('number', int(yy.matched_text()))
 	def scan_float(self, yy: interfaces.Scanner): yy.token('number', float(yy.matched_text()))
-	def scan_reserved_word(self, yy: interfaces.Scanner): yy.token(yy.matched_text(), self.RESERVED[yy.matched_text()])
+	def scan_reserved_word(self, yy: interfaces.Scanner):
+		word = yy.matched_text()
+		yy.token(word, self.RESERVED[word])
 	def scan_enter_string(self, yy: interfaces.Scanner):
 		yy.enter('in_string')
 		yy.token(yy.matched_text())
 	def scan_stringy_bit(self, yy: interfaces.Scanner): yy.token('character', yy.matched_text())
 	def scan_escaped_literal(self, yy: interfaces.Scanner): yy.token('character', yy.matched_text()[1])
-	def scan_shorthand_escape(self, yy: interfaces.Scanner): yy.token('character', chr(self.ESCAPES[yy.matched_text()[1]]))
+	def scan_shorthand_escape(self, yy: interfaces.Scanner): yy.token('character', self.ESCAPES[yy.matched_text()[1]])
 	def scan_unicode_escape(self, yy: interfaces.Scanner): yy.token('character', chr(int(yy.matched_text()[2:],16)))
 	def scan_leave_string(self, yy: interfaces.Scanner):
 		yy.enter('INITIAL')
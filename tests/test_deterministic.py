@@ -37,6 +37,57 @@ class TestContextFree(unittest.TestCase):
 		self.g.assoc(context_free.LEFT, ['d'])
 		assert self.g.decide_shift_reduce('c', 0) is context_free.RIGHT
 		assert self.g.decide_shift_reduce('d', 2) is context_free.LEFT
+	def test_duplicate_rule(self):
+		self.g.rule('S', ['a', 'b'], None, None, 0, None)
+		with self.assertRaises(context_free.DuplicateRule):
+			self.g.rule('S', ('a', 'b'), None, None, 1, None)
+		self.g.rule('T', ['a', 'b'], None, None, 0, None)
+		assert self.g.rules[1].rhs is self.g.rules[0].rhs
+	def test_revalidate_after_changes(self):
+		shorthand(self.g, {'S': 'aX', 'X': 'b'})
+		self.g.validate()
+		self.g.validate()
+		shorthand(self.g, {'Z': 'c'})
+		self.assertRaises(context_free.UnreachableSymbols, self.g.validate)
+		self.g.start.append('Z')
+		self.g.validate()
+		shorthand(self.g, {'X': 'Z', 'Z': 'X'})
+		self.assertRaises(context_free.RenamingLoop, self.g.validate)
+	def test_terminal_becomes_ill_founded(self):
+		shorthand(self.g, {'S': 'aX'})
+		self.g.validate()
+		shorthand(self.g, {'X': 'Xb'})
+		self.assertRaises(context_free.IllFoundedSymbols, self.g.validate)
+	def test_flat_rules(self):
+		shorthand(self.g, {'S': 'aXb|X', 'X': 'c'})
+		flat = self.g.flat_rules()
+		assert list(flat.rhs_offset) == [0, 3, 4, 5]
+		assert [flat.symbols[q] for q in flat.lhs] == ['S', 'S', 'X']
+		assert [flat.symbols[q] for q in flat.rhs] == ['a', 'X', 'b', 'X', 'c']
+		assert {s for q, s in enumerate(flat.symbols) if flat.terminal_mask >> q & 1} == {'a', 'b', 'c'}
+		assert self.g.flat_rules() is flat
+		shorthand(self.g, {'X': 'd'})
+		assert len(self.g.flat_rules().lhs) == 4
+	def test_bogons(self):
+		self.g.assoc(context_free.BOGUS, ['x', 'y'])
+		shorthand(self.g, {'S': 'a|bS'})
+		self.g.assert_no_bogons()
+		shorthand(self.g, {'S': 'cy'})
+		with self.assertRaises(context_free.RuleProducesBogusToken) as cm: self.g.assert_no_bogons()
+		assert cm.exception.args == (2,)
+	def test_ill_founded(self):
+		shorthand(self.g, {'S': 'a|bA', 'A': 'cB', 'B': 'A|dA'})
+		with self.assertRaises(context_free.IllFoundedSymbols) as cm: self.g.assert_well_founded()
+		assert cm.exception.args[0] == {'A', 'B'}
+	def test_first_and_epsilon_follows_changes(self):
+		shorthand(self.g, {'S': 'aX', 'X': 'b'})
+		first, epsilon = self.g.find_first_and_epsilon()
+		assert first['S'] == {'a'} and not epsilon
+		assert self.g.find_first_and_epsilon() == (first, epsilon)
+		shorthand(self.g, {'S': 'X'})
+		self.g.rule('X', [], None, 'nothing', (), None)
+		first, epsilon = self.g.find_first_and_epsilon()
+		assert first['S'] == {'a', 'b'} and epsilon == {'S', 'X'}
 
 class TableMethodTester(unittest.TestCase):
 	def setUp(self):
@@ -42,6 +42,7 @@ def parse_tester(self:unittest.TestCase, parse):
 	# Smoke Test
 	with self.subTest(text='25.2'): self.assertEqual(25.2, parse('25.2'))
 	with self.subTest(text=r'"\u00ff"'): self.assertEqual(chr(255), parse(r'"\u00ff"'))
+	with self.subTest(text=r'"a\tb\nc"'): self.assertEqual('a\tb\nc', parse(r'"a\tb\nc"'))
 	
 	# Glossary Entry
 	with self.subTest(text='[[glossary entry]]'):